@@ -1,8 +1,20 @@
+import math
+
 import streamlit as st
 import numpy as np
 import plotly.graph_objects as go
+import plotly.io as pio
+from numba import njit, prange
 from scipy import signal
 
+# Serialize figures through the C-backed orjson encoder when available;
+# stdlib json is the bottleneck for multi-trace float arrays.
+try:
+    import orjson  # noqa: F401
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    pass
+
 # Set page config
 st.set_page_config(
     page_title="Signal Modulation Oscilloscope",
@@ -10,8 +22,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
+# Custom CSS. Built once at import; the channel-controls frame targets the
+# sidebar expanders directly instead of injected <div> wrappers.
+_PAGE_CSS = """
     <style>
     .stPlotlyChart {
         background-color: #000000;
@@ -27,85 +40,297 @@ st.markdown("""
     .stSelectbox, .stSlider {
         margin-bottom: 0.5rem;
     }
-    .channel-controls {
+    section[data-testid="stSidebar"] details {
         border: 1px solid #444;
         padding: 0.5rem;
         margin: 0.5rem 0;
         border-radius: 5px;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(_PAGE_CSS, unsafe_allow_html=True)
+
+# Signal resolution
+N_SAMPLES = 10000
+T_END = 10.0
+
+# Module-level generator so BitGenerator state persists across calls
+_rng = np.random.default_rng()
+
+@st.cache_data(max_entries=8)
+def _time_vec(n_samples, t_end):
+    # float32 throughout: the display resolves ~3 decimals, and halving the
+    # element size halves memory traffic and the Plotly JSON payload.
+    # Integer ramp times dt matches np.linspace(0, t_end, n) endpoints
+    # without linspace's float64 intermediate.
+    dt = np.float32(t_end / (n_samples - 1))
+    return np.arange(n_samples, dtype=np.float32) * dt
+
+@st.cache_data(max_entries=64)
+def _phase_vec(frequency, n_samples, t_end):
+    # 2*pi*f*t is shared by every periodic waveform at the same frequency,
+    # so compute the broadcast once and let the cache serve repeat channels.
+    return (2 * np.pi * frequency) * _time_vec(n_samples, t_end)
+
+# One-period wavetables: indexing a table turns per-sample transcendental
+# calls (and scipy's per-call waveform math) into L1 cache loads.
+_LUT_SIZE = 4096  # power of two so phase wrap is a bitwise AND
+
+@st.cache_data(max_entries=4)
+def _wave_luts():
+    # Branchless closed forms over one period (u in [0, 1)); matches
+    # scipy.signal.square / sawtooth(width=0.5) without their Python-level
+    # mod/where machinery.
+    u = np.arange(_LUT_SIZE) / _LUT_SIZE
+    return {
+        "sine": np.sin(2 * np.pi * u).astype(np.float32),
+        "square": ((u < 0.5) * 2.0 - 1.0).astype(np.float32),
+        "triangle": (1.0 - 4.0 * np.abs(u - 0.5)).astype(np.float32),
+    }
+
+def _lut_index(w_t):
+    return (w_t * (_LUT_SIZE / (2 * np.pi))).astype(np.int32) & (_LUT_SIZE - 1)
 
 # Signal generators
-def generate_signal(signal_type, t, amplitude=1.0, frequency=1.0, offset=0.0):
-    if signal_type == "Sine Wave":
-        return amplitude * np.sin(2 * np.pi * frequency * t) + offset
-    elif signal_type == "Square Wave":
-        return amplitude * signal.square(2 * np.pi * frequency * t) + offset
+@st.cache_data(max_entries=64)
+def generate_signal(signal_type, n_samples, t_end, amplitude=1.0, frequency=1.0, offset=0.0):
+    t = _time_vec(n_samples, t_end)
+    if signal_type == "Binary Data":
+        # Draw one random bit per period of `frequency` and hold it with a
+        # single np.repeat — a readable bit stream instead of per-sample
+        # noise, built entirely on the C fast path.
+        samples_per_bit = max(1, round(n_samples / max(t_end * frequency, 1.0)))
+        n_bits = -(-n_samples // samples_per_bit)  # ceil division
+        bits = _rng.integers(0, 2, n_bits).astype(np.float32)
+        y = amplitude * np.repeat(bits, samples_per_bit)[:n_samples] + offset
+        return np.asarray(y, dtype=np.float32)
+    luts = _wave_luts()
+    idx = _lut_index(_phase_vec(frequency, n_samples, t_end))
+    if signal_type in ("Sine Wave", "Carrier Wave"):
+        y = amplitude * luts["sine"][idx] + offset
+    elif signal_type in ("Square Wave", "Clock Pulse"):
+        y = amplitude * luts["square"][idx] + offset
     elif signal_type == "Triangle Wave":
-        return amplitude * signal.sawtooth(2 * np.pi * frequency * t, 0.5) + offset
-    elif signal_type == "Clock Pulse":
-        return amplitude * signal.square(2 * np.pi * frequency * t, duty=0.5) + offset
-    elif signal_type == "Binary Data":
-        return amplitude * np.array([1 if np.random.random() > 0.5 else 0 for _ in range(len(t))]) + offset
-    elif signal_type == "Carrier Wave":
-        return amplitude * np.sin(2 * np.pi * frequency * t) + offset
-    return np.zeros_like(t)
-
-# Modulation
-
-def modulate_signal(carrier_freq, message_signal, t, mod_type, mod_index=1.0):
-    carrier = np.sin(2 * np.pi * carrier_freq * t)
-    if mod_type == "AM":
-        return (1 + mod_index * message_signal) * carrier
-    elif mod_type == "FM":
-        integrated_signal = np.cumsum(message_signal) * (t[1] - t[0])
-        return np.sin(2 * np.pi * carrier_freq * t + mod_index * integrated_signal)
-    elif mod_type == "PM":
-        return np.sin(2 * np.pi * carrier_freq * t + mod_index * message_signal)
-    elif mod_type == "ASK":
-        return carrier * ((message_signal > 0) * 0.5 + 0.5)
-    elif mod_type == "FSK":
-        return np.where(message_signal > 0,
-                        np.sin(2 * np.pi * carrier_freq * 1.5 * t),
-                        np.sin(2 * np.pi * carrier_freq * t))
-    elif mod_type == "PSK":
-        return carrier * np.sign(message_signal)
-    return np.zeros_like(t)
+        y = amplitude * luts["triangle"][idx] + offset
+    else:
+        return np.zeros_like(t)
+    return np.asarray(y, dtype=np.float32)
+
+# Modulation kernels: one fused loop per mod type so the carrier phase,
+# integration and sin happen in a single pass into a preallocated buffer.
+# Explicit signatures compile the kernels at import (persisted by
+# cache=True) so the first slider interaction doesn't eat the JIT cost.
+
+@njit("void(f4[::1], f4[::1], f4[::1], f8, f8)", cache=True, fastmath=True, parallel=True)
+def _am_kernel(out, t, msg, carrier_freq, mod_index):
+    two_pi_fc = 2.0 * math.pi * carrier_freq
+    for i in prange(t.size):
+        out[i] = (1.0 + mod_index * msg[i]) * math.sin(two_pi_fc * t[i])
+
+@njit("void(f4[::1], f4[::1], f4[::1], f8, f8)", cache=True, fastmath=True)
+def _fm_kernel(out, t, msg, carrier_freq, mod_index):
+    two_pi_fc = 2.0 * math.pi * carrier_freq
+    dt = t[1] - t[0]
+    acc = 0.0
+    for i in range(t.size):
+        acc += msg[i] * dt
+        out[i] = math.sin(two_pi_fc * t[i] + mod_index * acc)
+
+@njit("void(f4[::1], f4[::1], f4[::1], f8, f8)", cache=True, fastmath=True, parallel=True)
+def _pm_kernel(out, t, msg, carrier_freq, mod_index):
+    two_pi_fc = 2.0 * math.pi * carrier_freq
+    for i in prange(t.size):
+        out[i] = math.sin(two_pi_fc * t[i] + mod_index * msg[i])
+
+@njit("void(f4[::1], f4[::1], f4[::1], f8, f8)", cache=True, fastmath=True, parallel=True)
+def _ask_kernel(out, t, msg, carrier_freq, mod_index):
+    two_pi_fc = 2.0 * math.pi * carrier_freq
+    for i in prange(t.size):
+        # branchless gate: 1.0 where the bit is high, 0.5 where low
+        gate = 0.5 + 0.5 * (msg[i] > 0.0)
+        out[i] = gate * math.sin(two_pi_fc * t[i])
+
+@njit("void(f4[::1], f4[::1], f4[::1], f8, f8)", cache=True, fastmath=True)
+def _fsk_kernel(out, t, msg, carrier_freq, mod_index):
+    # Continuous-phase FSK: accumulate the per-sample selected frequency
+    # into one phase so a single sin covers both tones and tone switches
+    # don't jump in phase. The accumulator makes this a serial scan.
+    two_pi_fc = 2.0 * math.pi * carrier_freq
+    dt = t[1] - t[0]
+    acc = 0.0
+    for i in range(t.size):
+        factor = 1.5 if msg[i] > 0.0 else 1.0
+        acc += factor * two_pi_fc * dt
+        out[i] = math.sin(acc)
+
+@njit("void(f4[::1], f4[::1], f4[::1], f8, f8)", cache=True, fastmath=True, parallel=True)
+def _psk_kernel(out, t, msg, carrier_freq, mod_index):
+    two_pi_fc = 2.0 * math.pi * carrier_freq
+    for i in prange(t.size):
+        # branchless antipodal mapping: +1 for non-negative, -1 for negative
+        sign = 1.0 - 2.0 * np.signbit(msg[i])
+        out[i] = sign * math.sin(two_pi_fc * t[i])
+
+# Mod-type dispatch table, resolved once at import.
+_MOD_KERNELS = {
+    "AM": _am_kernel,
+    "FM": _fm_kernel,
+    "PM": _pm_kernel,
+    "ASK": _ask_kernel,
+    "FSK": _fsk_kernel,
+    "PSK": _psk_kernel,
+}
+
+@st.cache_data(max_entries=64)
+def modulate_signal(carrier_freq, message_params, n_samples, t_end, mod_type, mod_index=1.0):
+    t = _time_vec(n_samples, t_end)
+    kernel = _MOD_KERNELS.get(mod_type)
+    if kernel is None:
+        return np.zeros_like(t)
+    msg_type, msg_amplitude, msg_frequency, msg_offset = message_params
+    message_signal = generate_signal(msg_type, n_samples, t_end, msg_amplitude, msg_frequency, msg_offset)
+    out = np.empty_like(t)
+    kernel(out, t, message_signal, carrier_freq, mod_index)
+    return out
 
 # Simple demodulation (envelope and threshold based)
-def demodulate_signal(signal, mod_type):
+def demodulate_signal(modulated, mod_type):
     if mod_type == "AM":
-        return np.abs(signal)
+        # envelope = magnitude of the analytic signal
+        return np.abs(signal.hilbert(modulated)).astype(np.float32)
     elif mod_type == "FM" or mod_type == "PM":
-        return np.gradient(np.unwrap(np.angle(signal + 1j*signal)))
+        # instantaneous frequency = derivative of the analytic phase
+        phase = np.unwrap(np.angle(signal.hilbert(modulated)))
+        return np.gradient(phase).astype(np.float32)
     elif mod_type == "ASK":
-        return signal > 0.1
+        return (modulated > 0.1).astype(np.float32)
     elif mod_type == "PSK" or mod_type == "FSK":
-        return (signal > 0).astype(float)
-    return np.zeros_like(signal)
+        return (modulated > 0).astype(np.float32)
+    return np.zeros_like(modulated)
 
 # Plot
 
+# A 600px-tall trace cannot resolve 10k samples; cap what we hand Plotly.
+PLOT_MAX_POINTS = 1000
+
+@njit(cache=True)
+def _lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets downsampling: keeps the point in each
+    # bucket forming the largest triangle with the previously kept point
+    # and the next bucket's average, preserving visual shape.
+    n = x.size
+    idx = np.empty(n_out, np.intp)
+    idx[0] = 0
+    idx[n_out - 1] = n - 1
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = 0.0
+        avg_y = 0.0
+        for j in range(end, next_end):
+            avg_x += x[j]
+            avg_y += y[j]
+        count = next_end - end
+        avg_x /= count
+        avg_y /= count
+        max_area = -1.0
+        max_j = start
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > max_area:
+                max_area = area
+                max_j = j
+        idx[i + 1] = max_j
+        a = max_j
+    return idx
+
+# The layout never changes between frames; build and validate it once at
+# import instead of reconstructing the dict on every redraw.
+_BASE_LAYOUT = go.Layout(
+    title="Signal Visualization",
+    # constant uirevision: zoom/pan/legend state survives data updates and
+    # Plotly's React layer patches trace data instead of remounting the plot
+    uirevision="signals",
+    xaxis_title="Time (s)",
+    yaxis_title="Amplitude (V)",
+    height=600,
+    plot_bgcolor='black',
+    paper_bgcolor='black',
+    font=dict(color='white'),
+    margin=dict(l=20, r=20, t=40, b=20),
+    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, bgcolor='rgba(0,0,0,0.5)'),
+    xaxis=dict(gridcolor='#333', zerolinecolor='#666'),
+    yaxis=dict(gridcolor='#333', zerolinecolor='#666', range=[-2, 2])
+)
+
 def plot_signals(t, signals, colors, names, visible):
-    fig = go.Figure()
+    # Always emit one trace per channel in a fixed order and toggle
+    # `visible` rather than adding/removing traces: stable trace identity
+    # lets the browser patch the data arrays in place instead of tearing
+    # down and recreating trace objects on every update.
+    traces = []
     for signal, color, name, is_visible in zip(signals, colors, names, visible):
         if is_visible:
-            fig.add_trace(go.Scatter(x=t, y=signal, name=name, line=dict(color=color, width=2)))
-    fig.update_layout(
-        title="Signal Visualization",
-        xaxis_title="Time (s)",
-        yaxis_title="Amplitude (V)",
-        height=600,
-        plot_bgcolor='black',
-        paper_bgcolor='black',
-        font=dict(color='white'),
-        margin=dict(l=20, r=20, t=40, b=20),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, bgcolor='rgba(0,0,0,0.5)'),
-        xaxis=dict(gridcolor='#333', zerolinecolor='#666'),
-        yaxis=dict(gridcolor='#333', zerolinecolor='#666', range=[-2, 2])
-    )
-    return fig
+            if len(signal) > PLOT_MAX_POINTS:
+                idx = _lttb_indices(t, np.asarray(signal, dtype=np.float32), PLOT_MAX_POINTS)
+                x, y = t[idx], signal[idx]
+            else:
+                x, y = t, signal
+        else:
+            x, y = t[:0], signal[:0]  # hidden channels ship no points
+        traces.append(go.Scattergl(x=x, y=y, name=name, visible=is_visible,
+                                   line=dict(color=color, width=2)))
+    return go.Figure(data=traces, layout=_BASE_LAYOUT)
+
+# Figure cache keyed on the full control state: when no widget that feeds
+# the plot has moved, the rerun reuses the already-built figure instead of
+# recomputing signals, downsampling and rebuilding traces.
+@st.cache_data(max_entries=32)
+def _build_figure(carrier_freq, channels):
+    t = _time_vec(N_SAMPLES, T_END)
+    colors, names, visible = ['yellow', 'cyan', 'magenta'], [], []
+    message_params = ("Sine Wave", 1.0, 1.0, 0.0)
+
+    raw, gains, offsets = [], [], []
+    for i, (enabled, signal_type, amplitude, frequency, offset, mod_index) in enumerate(channels):
+        gain = 1.0
+        shift = 0.0
+        if "Message Signal" in signal_type:
+            signal = generate_signal("Sine Wave", N_SAMPLES, T_END, amplitude, frequency, offset)
+        elif "Clock Pulse" in signal_type:
+            signal = generate_signal("Clock Pulse", N_SAMPLES, T_END, amplitude, frequency, offset)
+        elif "Carrier Wave" in signal_type:
+            signal = generate_signal("Carrier Wave", N_SAMPLES, T_END, amplitude, carrier_freq, offset)
+        elif "Modulated" in signal_type:
+            mod_type = signal_type.split()[0]
+            signal = modulate_signal(carrier_freq, message_params, N_SAMPLES, T_END, mod_type, mod_index)
+            gain, shift = amplitude, offset
+        elif "Demodulated" in signal_type:
+            mod_type = signal_type.split()[0]
+            modulated = modulate_signal(carrier_freq, message_params, N_SAMPLES, T_END, mod_type, mod_index)
+            signal = demodulate_signal(modulated, mod_type)
+            gain, shift = amplitude, offset
+        else:
+            signal = np.zeros_like(t)
+
+        raw.append(np.asarray(signal, dtype=np.float32))
+        gains.append(gain)
+        offsets.append(shift)
+        names.append(f"CH{i+1}: {signal_type}")
+        visible.append(enabled)
+
+    # One (3, N) broadcast applies every channel's gain and offset at once
+    # instead of three separate passes. Mod types can differ per channel,
+    # so only this shared post-processing is batched, not the kernels.
+    stacked = np.stack(raw)
+    stacked *= np.asarray(gains, dtype=np.float32)[:, None]
+    stacked += np.asarray(offsets, dtype=np.float32)[:, None]
+    signals = list(stacked)
+
+    return plot_signals(t, signals, colors, names, visible)
 
 # Controls UI
 def channel_controls(channel_num, key_prefix):
@@ -143,52 +368,32 @@ def channel_controls(channel_num, key_prefix):
 
 def main():
     st.title("3-Channel Signal Modulation Oscilloscope")
-    t = np.linspace(0, 10, 10000)
 
     with st.sidebar:
         st.header("Global Settings")
         carrier_freq = st.slider("Carrier Frequency (Hz)", 1, 50, 10, key="global_carrier_freq")
         channels = []
         for i in range(3):
-            st.markdown(f"<div class='channel-controls'>", unsafe_allow_html=True)
             channels.append(channel_controls(i+1, f"ch{i+1}"))
-            st.markdown("</div>", unsafe_allow_html=True)
-
-    signals, colors, names, visible = [], ['yellow', 'cyan', 'magenta'], [], []
-    message_signal = generate_signal("Sine Wave", t, 1.0, 1.0, 0.0)
-    carrier = generate_signal("Carrier Wave", t, 1.0, carrier_freq, 0.0)
 
-    for i, (enabled, signal_type, amplitude, frequency, offset, mod_index) in enumerate(channels):
-        if "Message Signal" in signal_type:
-            signal = generate_signal("Sine Wave", t, amplitude, frequency, offset)
-        elif "Clock Pulse" in signal_type:
-            signal = generate_signal("Clock Pulse", t, amplitude, frequency, offset)
-        elif "Carrier Wave" in signal_type:
-            signal = generate_signal("Carrier Wave", t, amplitude, carrier_freq, offset)
-        elif "Modulated" in signal_type:
-            mod_type = signal_type.split()[0]
-            signal = modulate_signal(carrier_freq, message_signal, t, mod_type, mod_index)
-            signal = amplitude * signal + offset
-        elif "Demodulated" in signal_type:
-            mod_type = signal_type.split()[0]
-            modulated = modulate_signal(carrier_freq, message_signal, t, mod_type, mod_index)
-            signal = demodulate_signal(modulated, mod_type)
-            signal = amplitude * signal + offset
-        else:
-            signal = np.zeros_like(t)
-
-        signals.append(signal)
-        names.append(f"CH{i+1}: {signal_type}")
-        visible.append(enabled)
+    _scope(carrier_freq, tuple(channels))
 
+# The scope area is a fragment: Freeze/Run/Reset clicks rerun only this
+# function instead of the whole script (sidebar widgets included).
+@st.fragment
+def _scope(carrier_freq, channels):
     col1, col2, col3 = st.columns([1, 10, 1])
     with col2:
-        live_plot = st.empty()
         if 'frozen' not in st.session_state:
             st.session_state['frozen'] = False
-        while not st.session_state['frozen']:
-            fig = plot_signals(t, signals, colors, names, visible)
-            live_plot.plotly_chart(fig, use_container_width=True)
+        # Streamlit reruns on every widget change, so a single render per
+        # run is enough; freezing just pins the last figure.
+        if st.session_state['frozen'] and 'frozen_fig' in st.session_state:
+            fig = st.session_state['frozen_fig']
+        else:
+            fig = _build_figure(carrier_freq, channels)
+            st.session_state['frozen_fig'] = fig
+        st.plotly_chart(fig, use_container_width=True)
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -197,9 +402,10 @@ def main():
     with col2:
         if st.button("Run", use_container_width=True):
             st.session_state['frozen'] = False
+            st.rerun(scope="fragment")
     with col3:
         if st.button("Reset", use_container_width=True):
-            st.experimental_rerun()
+            st.rerun(scope="app")
 
 if __name__ == "__main__":
     main()